@@ -0,0 +1,276 @@
+from collections import Counter
+
+from tkinter_cell import CellState
+from tkinter_game_board import GameBoard
+
+
+# This file contains the object census, which counts the objects a board has settled into.
+# The live cells are split into islands of connected cells, using the cells that are alive at any
+# point over the next max_period generations so the phases of an oscillator stay together.
+# Each island is normalised under rotation and reflection, and the normalised shape is looked up
+# in a cache. Shapes that are not in the cache are simulated on their own until they repeat,
+# which gives their period and displacement, and every phase seen along the way is added to the
+# cache. This way an object only has to be simulated the first time it shows up.
+# Islands touching the edge of the board may depend on the edge to stay periodic, so those are
+# simulated on the bounded board at their real position and cached under that position instead.
+
+# The eight rotations and reflections as (xx, xy, yx, yy) in x' = xx * x + xy * y, y' = yx * x + yy * y
+_SYMMETRIES = ((1, 0, 0, 1), (0, -1, 1, 0), (-1, 0, 0, -1), (0, 1, -1, 0),
+               (-1, 0, 0, 1), (1, 0, 0, -1), (0, 1, 1, 0), (0, -1, -1, 0))
+
+# Common objects under the default rules, given as rows where 'o' is a live cell
+_KNOWN_OBJECTS = {
+    'block': ['oo', 'oo'],
+    'beehive': ['.oo.', 'o..o', '.oo.'],
+    'loaf': ['.oo.', 'o..o', '.o.o', '..o.'],
+    'boat': ['oo.', 'o.o', '.o.'],
+    'ship': ['oo.', 'o.o', '.oo'],
+    'tub': ['.o.', 'o.o', '.o.'],
+    'pond': ['.oo.', 'o..o', 'o..o', '.oo.'],
+    'blinker': ['ooo'],
+    'toad': ['.ooo', 'ooo.'],
+    'beacon': ['oo..', 'oo..', '..oo', '..oo'],
+    'glider': ['.o.', '..o', 'ooo'],
+    'lightweight spaceship': ['.o..o', 'o....', 'o...o', 'oooo.'],
+}
+_KNOWN_RULES = 'B3/S23'
+
+# Offsets of every cell within two cells, for merging pieces that may belong together
+_NEAR = tuple((dx, dy) for dx in range(-2, 3) for dy in range(-2, 3) if (dx, dy) != (0, 0))
+
+
+def _normalise(cells):
+    # Translate the cells so the top left corner of their bounding box is at (0, 0)
+    min_x = min(x for x, y in cells)
+    min_y = min(y for x, y in cells)
+    return tuple(sorted((x - min_x, y - min_y) for x, y in cells))
+
+
+def canonical_shape(cells):
+    """
+    Normalise a set of cells under translation, rotation and reflection.
+    Every orientation of the same shape gives the same tuple, so it can be used as a dict key.
+    """
+    return min(_normalise([(xx * x + xy * y, yx * x + yy * y) for x, y in cells])
+               for xx, xy, yx, yy in _SYMMETRIES)
+
+
+def _parse(rows):
+    return [(x, y) for y, row in enumerate(rows) for x, char in enumerate(row) if char == 'o']
+
+
+_KNOWN_SHAPES = {canonical_shape(_parse(rows)): name for name, rows in _KNOWN_OBJECTS.items()}
+
+
+def step(live, rules, width=None, height=None):
+    """
+    Advance a set of live coords a generation.
+    Without a width and height the cells live on an unbounded plane.
+    """
+    counts = Counter((x + dx, y + dy) for x, y in live for dx, dy in GameBoard._DIRECTIONS)
+    new_live = set()
+    for pos in live.union(counts):
+        x, y = pos
+        if width is not None and (x < 0 or x >= width or y < 0 or y >= height):
+            continue
+        state = CellState.alive if pos in live else CellState.dead
+        if rules.get_next_state(state, counts[pos]) == CellState.alive:
+            new_live.add(pos)
+    return new_live
+
+
+def _connect(cells, directions):
+    # Split a set of cells into groups connected through the given directions
+    groups = []
+    unvisited = set(cells)
+    while unvisited:
+        stack = [unvisited.pop()]
+        group = []
+        while stack:
+            x, y = stack.pop()
+            group.append((x, y))
+            for dx, dy in directions:
+                neighbor = (x + dx, y + dy)
+                if neighbor in unvisited:
+                    unvisited.remove(neighbor)
+                    stack.append(neighbor)
+        groups.append(group)
+    return groups
+
+
+def _merge_near(islands):
+    # Group whole islands that have cells within two cells of each other, using union find on
+    # the island indices, and return the groups as lists of indices
+    parents = list(range(len(islands)))
+
+    def find(i):
+        while parents[i] != i:
+            parents[i] = parents[parents[i]]
+            i = parents[i]
+        return i
+
+    owners = {cell: i for i, island in enumerate(islands) for cell in island}
+    for (x, y), i in owners.items():
+        for dx, dy in _NEAR:
+            j = owners.get((x + dx, y + dy))
+            if j is not None:
+                parents[find(i)] = find(j)
+
+    groups = {}
+    for i in range(len(islands)):
+        groups.setdefault(find(i), []).append(i)
+    return list(groups.values())
+
+
+def _touches_edge(cells, width, height):
+    if width is None:
+        return False
+    return any(x == 0 or y == 0 or x == width - 1 or y == height - 1 for x, y in cells)
+
+
+def format_census(counts):
+    # One line per object type, most common first
+    lines = ['{:>6}  {}'.format(count, label) for label, count in counts.most_common()]
+    if not lines:
+        lines = ['No objects']
+    return '\n'.join(lines)
+
+
+class ObjectCensus:
+    """
+    Counts the objects on a board. The cache of classified shapes is kept between calls,
+    so reuse the same census when running many soups.
+    """
+    def __init__(self, rules, max_period=30):
+        self._rules = rules
+        self._max_period = max_period
+        # (rulestring, canonical shape) to (label, whether it repeats on its own), with the board size
+        # and real position of the cells in place of the canonical shape for islands touching the edge
+        self._cache = {}
+
+    def take(self, live_coords, width=None, height=None):
+        # Count the objects in a set of live coords, returning a Counter of label to count.
+        # Debris that dies out on its own is not an object and is left out
+        counts = Counter()
+        unresolved = []
+        for island in self._find_islands(set(live_coords), width, height):
+            label, periodic = self._classify(island, width, height)
+            if periodic:
+                counts[label] += 1
+            else:
+                unresolved.append((island, label))
+
+        # Some objects fall apart into pieces that don't repeat on their own, like the front
+        # of a lightweight spaceship, so merge leftover pieces that are close and try again
+        for indices in _merge_near([island for island, label in unresolved]):
+            if len(indices) == 1:
+                label = unresolved[indices[0]][1]
+            else:
+                cells = [cell for i in indices for cell in unresolved[i][0]]
+                label = self._classify(cells, width, height)[0]
+            if label is not None:
+                counts[label] += 1
+        return counts
+
+    def take_board(self, board):
+        board_rows = board.get_board()
+        return self.take(board.get_live_coords(), len(board_rows[0]), len(board_rows))
+
+    def _find_islands(self, live, width, height):
+        # Group cells that are connected in any of the next max_period generations,
+        # then split the current live cells by those groups
+        envelope = set(live)
+        current = live
+        for _ in range(self._max_period):
+            current = step(current, self._rules, width, height)
+            envelope.update(current)
+        islands = [[cell for cell in group if cell in live] for group in _connect(envelope, GameBoard._DIRECTIONS)]
+        # Cells that only show up in later generations don't belong to anything yet
+        return [island for island in islands if island]
+
+    def _classify(self, island, width=None, height=None):
+        # Returns the label of the island and whether it repeats on its own,
+        # with None for the label if it dies out
+        rulestring = self._rules.get_rulestring()
+        if not _touches_edge(island, width, height):
+            width = height = None
+        key = self._cache_key(rulestring, island, width, height)
+        if key in self._cache:
+            return self._cache[key]
+
+        # Run the island on its own until it comes back to its starting shape
+        start = _normalise(island)
+        start_x = min(x for x, y in island)
+        start_y = min(y for x, y in island)
+        phases = [island]
+        current = set(island)
+        result = None
+        for period in range(1, self._max_period + 1):
+            current = step(current, self._rules, width, height)
+            if not current:
+                result = (None, False)
+                break
+            if _normalise(current) == start:
+                dx = abs(min(x for x, y in current) - start_x)
+                dy = abs(min(y for x, y in current) - start_y)
+                result = (self._label(phases, rulestring, period, dx, dy), True)
+                break
+            phases.append(current)
+
+        if result is None:
+            result = ('unclassified ({} cells)'.format(len(island)), False)
+        if not result[1]:
+            phases = [island]
+        for phase in phases:
+            self._cache[self._cache_key(rulestring, phase, width, height)] = result
+        return result
+
+    def _cache_key(self, rulestring, cells, width, height):
+        if width is None:
+            return rulestring, canonical_shape(cells)
+        return rulestring, (width, height), tuple(sorted(cells))
+
+    def _label(self, phases, rulestring, period, dx, dy):
+        if rulestring == _KNOWN_RULES:
+            for phase in phases:
+                name = _KNOWN_SHAPES.get(canonical_shape(phase))
+                if name is not None:
+                    return name
+        cells = min(len(phase) for phase in phases)
+        if dx == 0 and dy == 0:
+            if period == 1:
+                return 'still life ({} cells)'.format(cells)
+            return 'p{} oscillator ({} cells)'.format(period, cells)
+        return '({}, {})c/{} spaceship ({} cells)'.format(max(dx, dy), min(dx, dy), period, cells)
+
+
+def run_soups(num_soups, config, rules, max_generations=5000, max_period=30):
+    """
+    Run random boards without a display until they settle and add up their census.
+    A board counts as settled once its live cells repeat within max_period generations.
+    Boards that haven't settled after max_generations are left out of the totals.
+    Returns the totals and the number of boards that didn't settle.
+    """
+    census = ObjectCensus(rules, max_period)
+    totals = Counter()
+    unsettled = 0
+    for soup in range(num_soups):
+        board = GameBoard(config, rules)
+        recent = [frozenset(board.get_live_coords())]
+        settled = False
+        for _ in range(max_generations):
+            board.update()
+            live = frozenset(board.get_live_coords())
+            if live in recent:
+                settled = True
+                break
+            recent.append(live)
+            if len(recent) > max_period:
+                recent.pop(0)
+        if not settled:
+            unsettled += 1
+            print('Soup {}: not settled after {} generations, skipping.'.format(soup + 1, max_generations))
+            continue
+        totals.update(census.take_board(board))
+        print('Soup {}: settled at generation {}.'.format(soup + 1, board.get_generation()))
+    return totals, unsettled
@@ -0,0 +1,322 @@
+import asyncio
+import os
+import stat
+import struct
+import threading
+
+
+# This file contains the publisher that lets other programs follow a running simulation
+# without embedding tkinter. Each generation's changes are encoded into a compact binary
+# frame and written to every subscriber connected to a local unix or tcp socket.
+
+# Wire format:
+# Every frame is prefixed with its length as a big endian uint32.
+# Frame header: kind (uint8), generation (uint32), width (uint16), height (uint16), num_rows (uint16)
+# followed by num_rows row records: y (uint16), mode (uint8), payload.
+# A keyframe holds the live cells of the board, a delta holds the cells that flipped since
+# the previous frame. Both are stored as a per row XOR mask, so a keyframe is simply a delta
+# against an empty board.
+# Each row payload is either:
+# ROW_BITMAP: ceil(width / 8) bytes, bit x % 8 of byte x // 8 set for every flipped cell
+# ROW_RLE: a varint count followed by that many varints, alternating between runs of
+#          unchanged and flipped cells, starting with an unchanged run
+# and the encoder picks whichever of the two is smaller.
+
+# The simulation never waits on subscribers. A subscriber whose socket buffer fills up stops
+# receiving deltas and is sent a fresh keyframe as soon as its buffer has drained, even if the
+# simulation is paused by then.
+
+KEYFRAME = 0
+DELTA = 1
+
+ROW_BITMAP = 0
+ROW_RLE = 1
+
+_LENGTH = struct.Struct('>I')
+_HEADER = struct.Struct('>BIHHH')
+_ROW = struct.Struct('>HB')
+
+
+def _encode_varint(value, out):
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _decode_varint(data, offset):
+    value = 0
+    shift = 0
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, offset
+        shift += 7
+
+
+def _encode_row(xs, width):
+    # Build both encodings of the sorted x positions and keep the smaller one
+    bitmap = bytearray((width + 7) // 8)
+    for x in xs:
+        bitmap[x // 8] |= 1 << (x % 8)
+
+    runs = []
+    position = 0
+    for x in xs:
+        if runs and x == position:
+            runs[-1] += 1
+        else:
+            runs.append(x - position)
+            runs.append(1)
+        position = x + 1
+    rle = bytearray()
+    _encode_varint(len(runs), rle)
+    for run in runs:
+        _encode_varint(run, rle)
+
+    if len(rle) < len(bitmap):
+        return ROW_RLE, rle
+    return ROW_BITMAP, bitmap
+
+
+def encode_frame(kind, generation, width, height, rows):
+    """
+    Encode a frame given a dict of y to the x positions flipped in that row.
+    The returned bytes include the length prefix.
+    """
+    body = bytearray(_HEADER.pack(kind, generation, width, height, len(rows)))
+    for y in sorted(rows):
+        mode, payload = _encode_row(sorted(rows[y]), width)
+        body += _ROW.pack(y, mode)
+        body += payload
+    return _LENGTH.pack(len(body)) + bytes(body)
+
+
+def decode_frame(body):
+    """
+    Decode a frame body (without the length prefix) for subscribers.
+    Returns (kind, generation, width, height, rows) where rows maps y to a list of x positions.
+    """
+    kind, generation, width, height, num_rows = _HEADER.unpack_from(body, 0)
+    offset = _HEADER.size
+    rows = {}
+    for _ in range(num_rows):
+        y, mode = _ROW.unpack_from(body, offset)
+        offset += _ROW.size
+        xs = []
+        if mode == ROW_BITMAP:
+            num_bytes = (width + 7) // 8
+            for x in range(width):
+                if body[offset + x // 8] & (1 << (x % 8)):
+                    xs.append(x)
+            offset += num_bytes
+        else:
+            count, offset = _decode_varint(body, offset)
+            position = 0
+            for i in range(count):
+                run, offset = _decode_varint(body, offset)
+                if i % 2:
+                    xs.extend(range(position, position + run))
+                position += run
+        rows[y] = xs
+    return kind, generation, width, height, rows
+
+
+async def read_frame(reader):
+    # Helper for asyncio subscribers, reads and decodes the next frame from the stream
+    header = await reader.readexactly(_LENGTH.size)
+    body = await reader.readexactly(_LENGTH.unpack(header)[0])
+    return decode_frame(body)
+
+
+def _is_socket(path):
+    try:
+        return stat.S_ISSOCK(os.lstat(path).st_mode)
+    except FileNotFoundError:
+        return False
+
+
+class _Subscriber:
+    def __init__(self, writer):
+        self.writer = writer
+        # Set when the subscriber has fallen behind and needs a keyframe to resync
+        self.stale = False
+
+
+class DeltaPublisher:
+    """
+    Serves the changes of a game board to local subscribers. The asyncio server runs in its
+    own thread, so publishing from the tkinter thread only hands the data over to that loop.
+    """
+    def __init__(self, path=None, port=None, keyframe_interval=100,
+                 high_water=256 * 1024, low_water=16 * 1024):
+        if path is None and port is None:
+            raise ValueError('DeltaPublisher needs a unix socket path or a tcp port')
+        self._path = path
+        self._port = port
+        self._keyframe_interval = keyframe_interval
+        self._high_water = high_water
+        self._low_water = low_water
+
+        # Mirror of the board, only touched from the loop thread
+        self._width = 0
+        self._height = 0
+        self._generation = 0
+        self._rows = {}
+        self._subscribers = []
+
+        self._loop = None
+        self._server = None
+        self._thread = None
+        # Exception raised while starting the server, handed back to the thread calling start
+        self._start_error = None
+
+    def start(self):
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._start_error is not None:
+            raise self._start_error
+
+    def close(self):
+        if self._loop is None:
+            return
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop = None
+
+    def publish(self, board, celldata):
+        # Called with the list of changes from GameBoard.update or GameBoard.toggle_cell
+        coords = [board.get_coord(cell) for cell, state in celldata]
+        self._call(self._apply_delta, board.get_generation(), coords)
+
+    def publish_keyframe(self, board):
+        # Called whenever the board is changed in a way that is not a list of flips,
+        # e.g. clearing, resetting or resizing
+        coords = board.get_live_coords()
+        width = len(board.get_board()[0])
+        height = len(board.get_board())
+        self._call(self._apply_keyframe, board.get_generation(), width, height, coords)
+
+    def _call(self, func, *args):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(func, *args)
+
+    def _run(self, ready):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        try:
+            self._server = loop.run_until_complete(self._start_server())
+            self._loop = loop
+        except Exception as error:
+            # E.g. the port is in use, start() re-raises this
+            self._start_error = error
+            loop.close()
+            return
+        finally:
+            ready.set()
+        try:
+            loop.run_forever()
+        finally:
+            # Cancel the subscriber tasks and let them close their writers before the loop goes away
+            self._server.close()
+            tasks = asyncio.all_tasks(loop)
+            for task in tasks:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*tasks, return_exceptions=True))
+            loop.run_until_complete(self._server.wait_closed())
+            loop.close()
+            if self._path is not None and _is_socket(self._path):
+                os.unlink(self._path)
+
+    async def _start_server(self):
+        if self._path is not None:
+            # Only clean up a socket left behind by an earlier run, never anything else
+            if _is_socket(self._path):
+                os.unlink(self._path)
+            elif os.path.lexists(self._path):
+                raise FileExistsError('{} exists and is not a socket'.format(self._path))
+            return await asyncio.start_unix_server(self._handle_subscriber, path=self._path)
+        return await asyncio.start_server(self._handle_subscriber, host='127.0.0.1', port=self._port)
+
+    async def _handle_subscriber(self, reader, writer):
+        # Late joiners start from a keyframe, then get the deltas as they are published
+        subscriber = _Subscriber(writer)
+        self._subscribers.append(subscriber)
+        # Makes drain() wait until the buffer is below low_water once it went over high_water
+        writer.transport.set_write_buffer_limits(high=self._high_water, low=self._low_water)
+        writer.write(self._keyframe())
+        try:
+            # Subscribers are not expected to send anything, reading just tells us when they leave
+            while await reader.read(1024):
+                pass
+        except (ConnectionError, asyncio.CancelledError):
+            # Cancelled when the publisher closes, finish normally so the server doesn't log it
+            pass
+        finally:
+            self._subscribers.remove(subscriber)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    def _mark_stale(self, subscriber):
+        # Stop sending deltas and resync with a keyframe once the subscriber has caught up
+        subscriber.stale = True
+        self._loop.create_task(self._resync(subscriber))
+
+    async def _resync(self, subscriber):
+        writer = subscriber.writer
+        try:
+            await writer.drain()
+        except ConnectionError:
+            return
+        if subscriber.stale and not writer.is_closing():
+            subscriber.stale = False
+            writer.write(self._keyframe())
+
+    def _keyframe(self):
+        return encode_frame(KEYFRAME, self._generation, self._width, self._height, self._rows)
+
+    def _apply_keyframe(self, generation, width, height, coords):
+        self._generation = generation
+        self._width = width
+        self._height = height
+        self._rows = {}
+        for x, y in coords:
+            self._rows.setdefault(y, set()).add(x)
+        frame = self._keyframe()
+        for subscriber in self._subscribers:
+            # Stale subscribers get the current keyframe when they have drained
+            if not subscriber.stale:
+                subscriber.writer.write(frame)
+
+    def _apply_delta(self, generation, coords):
+        # Update the mirror, then send the delta to everyone who is keeping up
+        changed = {}
+        for x, y in coords:
+            changed.setdefault(y, []).append(x)
+            row = self._rows.setdefault(y, set())
+            row ^= {x}
+            if not row:
+                del self._rows[y]
+        self._generation = generation
+
+        if self._keyframe_interval and generation % self._keyframe_interval == 0:
+            frame = self._keyframe()
+        else:
+            frame = encode_frame(DELTA, generation, self._width, self._height, changed)
+
+        for subscriber in self._subscribers:
+            writer = subscriber.writer
+            if subscriber.stale or writer.is_closing():
+                continue
+            if writer.transport.get_write_buffer_size() > self._high_water:
+                # Drop the delta rather than stall the simulation
+                self._mark_stale(subscriber)
+            else:
+                writer.write(frame)
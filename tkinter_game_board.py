@@ -21,6 +21,12 @@ class GameRules:
     def set_rule(self, state, neighbors, newrule):
         self._transitions[state][neighbors] = newrule
 
+    def get_rulestring(self):
+        # The rules in B/S notation, e.g. B3/S23 for the default rules
+        born = ''.join(str(i) for i in range(9) if self._transitions[CellState.dead][i] == CellState.alive)
+        survive = ''.join(str(i) for i in range(9) if self._transitions[CellState.alive][i] == CellState.alive)
+        return 'B{}/S{}'.format(born, survive)
+
 
 # 
 class GameConfig:
@@ -195,6 +201,34 @@ class GameBoard:
     def get_initial_states(self):
         return self._initial_changes
 
+    def get_generation(self):
+        return self._generation
+
+    def get_live_coords(self):
+        return [self._cell_positions[cell] for row in self._board for cell in row
+                if cell.get_state() == CellState.alive]
+
+    def set_state(self, generation, live_coords):
+        # Put the board into a previously recorded state, returning the changed cells
+        # in the same format as update so the GUI can draw them
+        self._generation = generation
+        self._live_count = len(live_coords)
+        changes = []
+        for row in self._board:
+            for cell in row:
+                if self._cell_positions[cell] in live_coords:
+                    state = CellState.alive
+                else:
+                    state = CellState.dead
+                if state != cell.get_state():
+                    changes.append((cell, state))
+        for cell, state in changes:
+            if state == CellState.alive:
+                cell.set_alive()
+            else:
+                cell.set_dead()
+        return changes
+
     def get_info_string(self):
         return 'Generation: {} - Live cells: {}'.format(self._generation, self._get_total_live_cells())
 
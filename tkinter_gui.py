@@ -2,7 +2,9 @@ from collections import OrderedDict
 from tkinter import *
 
 from tkinter_cell import CellState
+from tkinter_census import ObjectCensus, format_census
 from tkinter_game_board import GameBoard, GameConfig, GameRules
+from tkinter_history import GameHistory
 
 WHITE = '#FFFFFF'
 BLACK = '#000000'
@@ -22,6 +24,8 @@ BLACK = '#000000'
 # Each cell in the logical gameboard is linked to a rectangle on the canvas through a dict.
 # When changes are made and the gameboard is updated, a list of changes are sent to the GUI which
 # sets the corresponding rects to the right color.
+# The same list of changes is recorded in a GameHistory (see tkinter_history.py), which lets the
+# GUI seek back to earlier generations.
 
 # GameConfigGUI:
 # This class links to the game config in the logic portion, with methods for altering the config values
@@ -38,16 +42,24 @@ BLACK = '#000000'
 
 # ActionGUI:
 # This class links buttons to methods of the GameApp for controlling the simulation
+# It also holds the timeline slider for scrubbing through the generations kept in the history
+
+# If the GameApp is given a DeltaPublisher (see tkinter_delta_stream.py), the GameBoardGUI also hands
+# every change it draws to the publisher, so external subscribers can follow the simulation.
 
 
 
 # This class provides a GUI connected to the gameboard class
 class GameBoardGUI(Frame):
-    def __init__(self, master, board_config, rules):
+    def __init__(self, master, board_config, rules, publisher=None):
         super().__init__(master)
         self.master = master
         self._board_config = board_config
         self._rules = rules
+        self._publisher = publisher
+        self._history = GameHistory()
+        # Kept for the lifetime of the GUI so known shapes don't have to be classified again
+        self._census = ObjectCensus(self._rules)
         self._num_cells_x = board_config.get_num_cells_x()
         self._num_cells_y = board_config.get_num_cells_y()
         self._scale = board_config.get_scale()
@@ -80,11 +92,15 @@ class GameBoardGUI(Frame):
         self._draw_changes(self._game_board.get_initial_states())
         # Set the info string that displays generation number etc
         self.vars['info'].set(self._game_board.get_info_string())
+        self._record_keyframe()
+        self._publish_keyframe()
 
     def update(self):
         # Update the gameboard and then the GUI
         celldata = self._game_board.update()
         self._draw_changes(celldata)
+        self._record_changes(celldata)
+        self._publish(celldata)
         self.vars['info'].set(self._game_board.get_info_string())
 
     def unpack(self):
@@ -97,6 +113,8 @@ class GameBoardGUI(Frame):
         cell_y = event.y // scale
         celldata = self._game_board.toggle_cell(cell_x, cell_y)
         self._draw_changes(celldata)
+        self._record_changes(celldata)
+        self._publish(celldata)
         print('Toggling cell at ({}, {}).'.format(cell_x, cell_y))
 
     def _draw_changes(self, celldata):
@@ -105,6 +123,57 @@ class GameBoardGUI(Frame):
             color = self.colors[state]
             self._widgets['canvas'].itemconfig(self.links[cell], fill=color)
 
+    def _record_changes(self, celldata):
+        # Store the flipped cells so we can step back later
+        coords = [self._game_board.get_coord(cell) for cell, state in celldata]
+        self._history.record_changes(self._game_board.get_generation(), coords)
+
+    def _record_keyframe(self):
+        board = self._game_board
+        self._history.record_keyframe(board.get_generation(), self._num_cells_x, self._num_cells_y,
+                                      board.get_live_coords())
+
+    def seek(self, generation):
+        # Restore the board to a generation kept in the history and redraw the cells that differ
+        live_coords = self._history.seek(generation)
+        if live_coords is None:
+            return
+        celldata = self._game_board.set_state(generation, live_coords)
+        self._draw_changes(celldata)
+        self._publish(celldata)
+        self.vars['info'].set(self._game_board.get_info_string())
+
+    def step_back(self):
+        self.seek(self._game_board.get_generation() - 1)
+
+    def census(self):
+        # Count the objects currently on the board and show them in a window of their own,
+        # printing them as well so they end up in the logs
+        counts = self._census.take_board(self._game_board)
+        title = 'Census at generation {}'.format(self._game_board.get_generation())
+        report = format_census(counts)
+        print(title + ':')
+        print(report)
+        window = Toplevel(self)
+        window.title(title)
+        Label(window, text=report, justify=LEFT, font='TkFixedFont').pack(padx=10, pady=10)
+        Button(window, text='Close', command=window.destroy).pack(pady=5)
+
+    def get_timeline(self):
+        # Returns the oldest and newest generation in the history, and the current one
+        first, last = self._history.get_range()
+        return first, last, self._game_board.get_generation()
+
+    def _publish(self, celldata):
+        # Send the flipped cells to any external subscribers
+        if self._publisher is not None:
+            self._publisher.publish(self._game_board, celldata)
+
+    def _publish_keyframe(self):
+        # Send the whole board when it changed without a list of flips
+        if self._publisher is not None:
+            self._publisher.publish_keyframe(self._game_board)
+
     def _create_cell_links(self):
         # Create a dict of cell to rectangle, linking each cell with a corresponding rectangle on the canvas
         graph = self._game_board.get_board()
@@ -126,6 +195,8 @@ class GameBoardGUI(Frame):
         self._game_board.clear()
         celldata = [(cell, CellState.dead) for row in self._game_board.get_board() for cell in row]
         self._draw_changes(celldata)
+        self._record_keyframe()
+        self._publish_keyframe()
 
     def reset(self):
         # Remove all the rectangles and remake them
@@ -135,6 +206,10 @@ class GameBoardGUI(Frame):
         self._create_cell_links()
         self.vars['info'].set(self._game_board.get_info_string())
         self._draw_changes(self._game_board.get_initial_states())
+        # The generation count starts over, so the old history no longer applies
+        self._history.clear()
+        self._record_keyframe()
+        self._publish_keyframe()
 
     def change_size(self):
         # Change the canvas size, reset everything and redraw
@@ -371,14 +446,25 @@ class ActionGUI(Frame):
         # We have a series of buttons bound to function callbacks to let the user play, reset etc
         self._widgets['label'] = Label(self, text='Actions: ')
         self._widgets['play_pause'] = Button(self, text='Play/Pause', command=self.master.play_pause)
+        self._widgets['step_back'] = Button(self, text='Step back', command=self.master.step_back)
         self._widgets['advance'] = Button(self, text='Advance', command=self.master.advance)
-        self._widgets['clear'] = Button(self, text='Clear', command=self.master._game_board.clear)
+        self._widgets['clear'] = Button(self, text='Clear', command=self.master.clear)
         self._widgets['reset'] = Button(self, text='Reset', command=self.master.reset)
+        self._widgets['census'] = Button(self, text='Census', command=self.master.census)
         self._widgets['quit'] = Button(self, text='Quit', command=self.quit)
+        # Slider covering the generations kept in the history, dragging it seeks the board
+        self._widgets['timeline_label'] = Label(self, text='Timeline: ')
+        self._timeline_var = IntVar(self, 0)
+        self._widgets['timeline'] = Scale(self, orient=HORIZONTAL, from_=0, to=0,
+                variable=self._timeline_var, command=self.master.scrub)
 
         for widget in self._widgets.values():
             widget.pack(side=LEFT)
 
+    def set_timeline(self, first, last, current):
+        self._widgets['timeline'].config(from_=first, to=last)
+        self._timeline_var.set(current)
+
     def unpack(self):
         self.pack_forget()
 
@@ -388,7 +474,7 @@ class ActionGUI(Frame):
 
 # The main application itself, holds all the other GUIs
 class GameApp(Frame):
-    def __init__(self):
+    def __init__(self, publisher=None):
         # Initialize top level window
         Frame.__init__(self, relief=FLAT)
         # Dialog allows floating windows in certain window managers
@@ -405,10 +491,11 @@ class GameApp(Frame):
         self._rules = GameRules()
 
         # Game board and other guis
-        self._game_board = GameBoardGUI(self, self._board_config, self._rules)
+        self._game_board = GameBoardGUI(self, self._board_config, self._rules, publisher)
         self._action_gui = ActionGUI(self)
         self._config_gui = GameConfigGUI(self, self._board_config)
         self._rule_gui = GameRulesGUI(self, self._rules)
+        self._update_timeline()
 
     def play_pause(self):
         # If we are not playing, calculate the delay between each frame and start 
@@ -434,14 +521,44 @@ class GameApp(Frame):
     def _play_frame(self):
         # Update everything, then create a callback that will play the next frame
         self._game_board.update()
+        self._update_timeline()
         self._play_id = self.after(self._delay, self._play_frame)
 
     def advance(self):
         # Single step the simulation
         self._game_board.update()
+        self._update_timeline()
+
+    def step_back(self):
+        # Pause and go back a generation in the history
+        self.stop()
+        self._game_board.step_back()
+        self._update_timeline()
+
+    def scrub(self, value):
+        # Called by the timeline slider, also when we move it ourselves, so only
+        # pause and seek when it points at a different generation
+        generation = int(value)
+        if generation == self._game_board.get_timeline()[2]:
+            return
+        self.stop()
+        self._game_board.seek(generation)
+        self._update_timeline()
+
+    def _update_timeline(self):
+        self._action_gui.set_timeline(*self._game_board.get_timeline())
+
+    def clear(self):
+        # Clearing after a seek drops the later history, so the timeline has to shrink
+        self._game_board.clear()
+        self._update_timeline()
 
     def reset(self):
         self._game_board.reset()
+        self._update_timeline()
+
+    def census(self):
+        self._game_board.census()
 
     def quit(self):
         self.master.quit()
@@ -458,6 +575,7 @@ class GameApp(Frame):
         scale = self._board_config.get_scale()
         print('Rebuilding - x: {} y: {} scale: {}.'.format(num_cells_x, num_cells_y, scale))
         self._game_board.change_size()
+        self._update_timeline()
 
         self._action_gui.repack()
         self._config_gui.repack()
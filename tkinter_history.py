@@ -0,0 +1,129 @@
+import zlib
+from bisect import bisect_right
+
+from tkinter_delta_stream import DELTA, KEYFRAME, decode_frame, encode_frame
+
+
+# This file contains the history used for stepping the simulation backwards.
+# Every change made to the board is recorded as a delta of the cells that flipped, with a full
+# keyframe of the live cells stored every keyframe_interval deltas. Entries are encoded with the
+# same row format as the delta stream (see tkinter_delta_stream.py) and compressed with zlib.
+# When the history grows past its memory limit, the oldest entries are evicted a keyframe at a
+# time, so every retained generation can still be rebuilt from the keyframe before it.
+# Recording a change after seeking backwards drops the entries that came after that point.
+
+
+class GameHistory:
+    def __init__(self, keyframe_interval=50, memory_limit=8 * 1024 * 1024):
+        self._keyframe_interval = keyframe_interval
+        self._memory_limit = memory_limit
+        self.clear()
+
+    def clear(self):
+        # Entries are (kind, blob), with the generation of each entry kept in a parallel list
+        # so we can bisect on it
+        self._entries = []
+        self._generations = []
+        self._size = 0
+        # Mirror of the board at the current generation, used for building keyframes
+        self._live = set()
+        self._width = 0
+        self._height = 0
+        self._generation = 0
+        self._since_keyframe = 0
+        # Index of the entry we last seeked to, None when we are at the newest entry
+        self._head = None
+
+    def record_keyframe(self, generation, width, height, live_coords):
+        # Used when the board changes without a list of flips, e.g. clearing or resetting
+        self._truncate()
+        self._width = width
+        self._height = height
+        self._live = set(live_coords)
+        self._append(generation, KEYFRAME, self._live)
+
+    def record_changes(self, generation, coords):
+        # Used with the coords of the cells flipped by GameBoard.update or GameBoard.toggle_cell
+        if not self._entries:
+            return
+        self._truncate()
+        self._live.symmetric_difference_update(coords)
+        if self._since_keyframe + 1 >= self._keyframe_interval:
+            self._append(generation, KEYFRAME, self._live)
+        else:
+            self._append(generation, DELTA, coords)
+
+    def get_range(self):
+        # Oldest and newest generation that can be seeked to
+        if not self._entries:
+            return None
+        return self._generations[0], self._generations[-1]
+
+    def seek(self, generation):
+        """
+        Rebuild the set of live coords at a given generation.
+        Returns None if the generation is not retained.
+        """
+        if not self._entries:
+            return None
+        if generation < self._generations[0] or generation > self._generations[-1]:
+            return None
+        # Apply the deltas from the nearest keyframe up to the last entry of the generation
+        index = bisect_right(self._generations, generation) - 1
+        start = index
+        while self._entries[start][0] != KEYFRAME:
+            start -= 1
+        live = self._decode(start)
+        for i in range(start + 1, index + 1):
+            live.symmetric_difference_update(self._decode(i))
+
+        self._live = live
+        self._generation = generation
+        self._since_keyframe = index - start
+        # Entries after index stay around for scrubbing forward until something new is recorded
+        self._head = index
+        return set(live)
+
+    def _truncate(self):
+        # Drop everything after the entry we last seeked to
+        if self._head is None:
+            return
+        for kind, blob in self._entries[self._head + 1:]:
+            self._size -= len(blob)
+        del self._entries[self._head + 1:]
+        del self._generations[self._head + 1:]
+        self._head = None
+
+    def _append(self, generation, kind, coords):
+        rows = {}
+        for x, y in coords:
+            rows.setdefault(y, []).append(x)
+        blob = zlib.compress(encode_frame(kind, generation, self._width, self._height, rows))
+        self._entries.append((kind, blob))
+        self._generations.append(generation)
+        self._size += len(blob)
+        self._generation = generation
+        self._since_keyframe = 0 if kind == KEYFRAME else self._since_keyframe + 1
+        self._evict()
+
+    def _decode(self, index):
+        # Skip the length prefix that encode_frame adds for streaming
+        body = zlib.decompress(self._entries[index][1])[4:]
+        rows = decode_frame(body)[4]
+        return {(x, y) for y, xs in rows.items() for x in xs}
+
+    def _evict(self):
+        # Drop the oldest keyframe and its deltas until we are under the limit,
+        # but always keep the newest keyframe
+        while self._size > self._memory_limit:
+            next_keyframe = None
+            for i in range(1, len(self._entries)):
+                if self._entries[i][0] == KEYFRAME:
+                    next_keyframe = i
+                    break
+            if next_keyframe is None:
+                return
+            for kind, blob in self._entries[:next_keyframe]:
+                self._size -= len(blob)
+            del self._entries[:next_keyframe]
+            del self._generations[:next_keyframe]
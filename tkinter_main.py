@@ -1,12 +1,41 @@
 #!/usr/bin/env python3
 
+from argparse import ArgumentParser
 
+from tkinter_census import format_census, run_soups
+from tkinter_delta_stream import DeltaPublisher
+from tkinter_game_board import GameConfig, GameRules
 from tkinter_gui import GameApp
 
 def main():
-    App = GameApp()
+    parser = ArgumentParser(description='Game of life')
+    parser.add_argument('--stream-socket', help='Publish board changes on this unix socket')
+    parser.add_argument('--stream-port', type=int, help='Publish board changes on this localhost tcp port')
+    parser.add_argument('--census', type=int, metavar='SOUPS',
+                        help='Run this many random boards without a display and print the objects they settle into')
+    args = parser.parse_args()
+
+    if args.census is not None:
+        totals, unsettled = run_soups(args.census, GameConfig(), GameRules())
+        print(format_census(totals))
+        if unsettled:
+            print('{} of {} soups did not settle and were left out.'.format(unsettled, args.census))
+        return
+
+    publisher = None
+    if args.stream_socket is not None or args.stream_port is not None:
+        publisher = DeltaPublisher(path=args.stream_socket, port=args.stream_port)
+        try:
+            publisher.start()
+        except OSError as error:
+            parser.error('could not start the stream: {}'.format(error))
+
+    App = GameApp(publisher)
     App.mainloop()
 
+    if publisher is not None:
+        publisher.close()
+
 
 if __name__ == '__main__':
     main()